@@ -1,15 +1,39 @@
 import os
 import sys
-import openai
+import asyncio
+import time
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from concurrent.futures import ThreadPoolExecutor, Future
+from urllib.parse import urlparse, parse_qs, urlencode, urlunparse
 import json
+import copy
+import functools
+from collections import OrderedDict
+from collections.abc import Iterator
+import types
 import re
+from fnmatch import translate
 import yaml
+try:
+    # Prefer the libyaml-backed loader when PyYAML was built with it
+    from yaml import CSafeLoader as SafeLoader
+except ImportError:
+    from yaml import SafeLoader
+try:
+    # orjson parses and serializes GitHub payloads several times faster than json
+    import orjson
+    _loads = orjson.loads
+    _dumps = orjson.dumps
+except ImportError:
+    _loads = json.loads
+    def _dumps(obj):
+        return json.dumps(obj).encode('utf-8')
 from github import Github
-from pathlib import Path
 import logging
 from datetime import datetime
-import httpx
+from dataclasses import dataclass
 
 # Configure logging
 logging.basicConfig(
@@ -19,6 +43,140 @@ logging.basicConfig(
 )
 logger = logging.getLogger("PR_Reviewer")
 
+# Default maximum number of OpenAI review requests in flight at once (REVIEW_CONCURRENCY env var)
+REVIEW_CONCURRENCY = 8
+
+# Maximum number of concurrent GitHub API requests
+GITHUB_CONCURRENCY = 4
+
+# Maximum number of inline comments posted at once when not batched into a review
+COMMENT_CONCURRENCY = 8
+
+def _create_session():
+    """Create a pooled HTTP session with retries for GitHub API calls."""
+    session = requests.Session()
+    # Once retries run out, return the last 5xx response so callers' status checks handle it
+    retry = Retry(total=3, backoff_factor=0.3, status_forcelist=[502, 503, 504], raise_on_status=False)
+    adapter = HTTPAdapter(pool_connections=10, pool_maxsize=20, max_retries=retry)
+    session.mount("https://", adapter)
+    return session
+
+# Shared session so all GitHub calls reuse the same TLS connections
+SESSION = _create_session()
+# Request bodies are serialized with _dumps, so the content type is set explicitly
+_JSON_HEADERS = {"Content-Type": "application/json"}
+
+# Entries of GitHub's Link pagination header
+_NEXT_LINK_RE = re.compile(r'<([^>]+)>;\s*rel="next"')
+_LAST_LINK_RE = re.compile(r'<([^>]+)>;\s*rel="last"')
+
+# Characters that make an fnmatch pattern more than a literal name
+_GLOB_CHARS_RE = re.compile(r'[*?\[]')
+# Inline comment line in the AI response; captures exactly two groups: line number and comment text
+_INLINE_RE = re.compile(r'^(?:(?:Line(?:\s+number)?|L)?[\s:]*)(\d+)[\s:]+(.+)$', re.IGNORECASE | re.MULTILINE)
+# A whole line that could be the start or middle of an _INLINE_RE match continuing on the next line
+_CONTINUED_LINE_RE = re.compile(r'(?:Line|L)?[\s:]*(?:number)?[\s:]*\d*[\s:]*', re.IGNORECASE)
+
+# Head commit and existing review comments of a PR, fetched in a single round trip
+PR_METADATA_QUERY = """
+query($owner: String!, $name: String!, $number: Int!, $after: String) {
+  repository(owner: $owner, name: $name) {
+    pullRequest(number: $number) {
+      headRefOid
+      reviewThreads(first: 100, after: $after) {
+        pageInfo { hasNextPage endCursor }
+        nodes {
+          comments(first: 100) {
+            nodes { path position body }
+          }
+        }
+      }
+    }
+  }
+}
+"""
+
+# Static part of the review prompt, filled in once per run from the config
+PROMPT_INSTRUCTIONS_TEMPLATE = """INSTRUCTIONS:
+1. **Review Focus**: Focus on {focus}
+2. **Comment Threshold**: {threshold}
+3. **Review Mode**: {mode}
+4. **Language-Specific Guidance**: {language_specific}
+
+5. **Inline Comments**:
+   - Only comment on lines that NEED improvement or contain issues
+   - CRITICAL: Format comments EXACTLY as: "Line X: Your detailed comment" where X is the line number
+   - For each comment:
+     * Be specific about what the issue is
+     * Explain WHY it matters (security risk, performance impact, etc.)
+     * Provide a concrete suggestion for improvement
+     * If possible, include a code example of the fix
+   - Prioritize significant issues (security, bugs, performance) over minor style issues
+
+6. **PR Summary**:
+   - Provide a concise summary (<= {summary_length} words)
+   - Highlight the most important changes and their impact
+   - Mention any architectural implications
+   - Note positive aspects, not just criticisms
+   - Prioritize suggestions by importance
+
+Output format:
+[Inline Comments]
+
+Summary:
+[Your summary here]
+"""
+
+# Marker prepended to every inline comment; also used to recognise our own existing comments
+AI_PREFIX = "💡 **AI Review:** "
+
+# Parsed config caches, keyed by file identity (local) or blob SHA (remote)
+_local_config_cache = {}
+_remote_config_cache = OrderedDict()
+
+# Maximum number of remote config parses kept in memory
+REMOTE_CONFIG_CACHE_SIZE = 100
+
+def _read_yaml_cached(path):
+    """Parse a local YAML file, reusing the previous parse while the file is unchanged."""
+    path = os.path.abspath(path)
+    st = os.stat(path)
+    key = (st.st_mtime_ns, st.st_size, st.st_ino)
+    
+    cached = _local_config_cache.get(path)
+    if cached is None or cached[0] != key:
+        with open(path, 'r') as f:
+            cached = (key, yaml.load(f, Loader=SafeLoader))
+        _local_config_cache[path] = cached
+        
+    # Return a copy so merging can't mutate the cached config
+    return copy.deepcopy(cached[1])
+
+def _read_remote_yaml_cached(repo_name, file_content):
+    """Parse a config file fetched from GitHub, keyed by its blob SHA in a bounded LRU."""
+    # The blob SHA is already a hash of the content, so the bytes don't need rehashing
+    key = (repo_name, file_content.sha)
+    if key in _remote_config_cache:
+        _remote_config_cache.move_to_end(key)
+    else:
+        # PyYAML detects the encoding of raw bytes itself
+        _remote_config_cache[key] = yaml.load(file_content.decoded_content, Loader=SafeLoader)
+        if len(_remote_config_cache) > REMOTE_CONFIG_CACHE_SIZE:
+            _remote_config_cache.popitem(last=False)
+    return copy.deepcopy(_remote_config_cache[key])
+
+def _deep_merge(dst, src):
+    """Recursively merge src into dst in place; nested dicts are merged, other values replaced."""
+    stack = [(dst, src)]
+    while stack:
+        dst_dict, src_dict = stack.pop()
+        for key, value in src_dict.items():
+            current = dst_dict.get(key)
+            if isinstance(value, dict) and isinstance(current, dict):
+                stack.append((current, value))
+            else:
+                dst_dict[key] = value
+
 class PRReviewConfig:
     """Configuration manager for the PR review process."""
     
@@ -64,7 +222,7 @@ class PRReviewConfig:
     }
     
     def __init__(self):
-        self.config = self.DEFAULT_CONFIG.copy()
+        self.config = copy.deepcopy(self.DEFAULT_CONFIG)
         self.load_custom_config()
         
         # Override with direct environment variables if provided
@@ -72,6 +230,27 @@ class PRReviewConfig:
             self.config["review_mode"] = os.getenv("REVIEW_MODE")
         if os.getenv("COMMENT_THRESHOLD"):
             self.config["comment_threshold"] = os.getenv("COMMENT_THRESHOLD")
+            
+        # Compile the file filters once instead of matching every glob per file
+        # Plain names and "*<suffix>" globs (e.g. "*.md") need no regex: since
+        # fnmatch's "*" also matches "/", they are exact and endswith() checks
+        exclude_exact, exclude_suffixes, exclude_globs = set(), [], []
+        for pattern in self.config["file_filters"]["exclude"]:
+            if not _GLOB_CHARS_RE.search(pattern):
+                exclude_exact.add(pattern)
+            elif pattern.startswith("*") and not _GLOB_CHARS_RE.search(pattern, 1):
+                exclude_suffixes.append(pattern[1:])
+            else:
+                exclude_globs.append(pattern)
+        self._exclude_exact = frozenset(exclude_exact)
+        self._exclude_suffixes = tuple(exclude_suffixes)
+        self._exclude_re = self._compile_patterns(exclude_globs)
+        self._include_re = self._compile_patterns(self.config["file_filters"]["include"])
+        # A bare "*" include (the default) matches every filename
+        self._include_all = "*" in self.config["file_filters"]["include"]
+        
+        # The prompt additions only depend on the final config, so build them once
+        self._prompt_additions = self._build_prompt_additions()
         
     def load_custom_config(self):
         """Load custom configuration from the repository."""
@@ -89,7 +268,7 @@ class PRReviewConfig:
                 if config_path:
                     try:
                         file_content = repo.get_contents(config_path)
-                        custom_config = yaml.safe_load(file_content.decoded_content.decode('utf-8'))
+                        custom_config = _read_remote_yaml_cached(repo_name, file_content)
                         self._merge_config(custom_config)
                         logger.info(f"Loaded custom config from {config_path}")
                         return
@@ -100,7 +279,7 @@ class PRReviewConfig:
                 for default_path in [".github/pr_review_config.yml", ".github/pr_review_config.yaml"]:
                     try:
                         file_content = repo.get_contents(default_path)
-                        custom_config = yaml.safe_load(file_content.decoded_content.decode('utf-8'))
+                        custom_config = _read_remote_yaml_cached(repo_name, file_content)
                         self._merge_config(custom_config)
                         logger.info(f"Loaded custom config from {default_path}")
                         break
@@ -111,11 +290,10 @@ class PRReviewConfig:
             action_default_config = os.path.join(os.path.dirname(__file__), "default_config.yml")
             if os.path.exists(action_default_config):
                 try:
-                    with open(action_default_config, 'r') as f:
-                        custom_config = yaml.safe_load(f)
-                        if custom_config:
-                            logger.info(f"Loaded default config from action: {action_default_config}")
-                            self._merge_config(custom_config)
+                    custom_config = _read_yaml_cached(action_default_config)
+                    if custom_config:
+                        logger.info(f"Loaded default config from action: {action_default_config}")
+                        self._merge_config(custom_config)
                 except Exception as e:
                     logger.warning(f"Error loading default action config: {str(e)}")
                     
@@ -124,49 +302,47 @@ class PRReviewConfig:
     
     def _merge_config(self, custom_config):
         """Merge custom configuration with defaults."""
-        for key, value in custom_config.items():
-            if key in self.config:
-                if isinstance(value, dict) and isinstance(self.config[key], dict):
-                    # Deep merge for dictionaries
-                    self.config[key].update(value)
-                else:
-                    # Direct replacement for other types
-                    self.config[key] = value
-            else:
-                # Add new keys
-                self.config[key] = value
+        _deep_merge(self.config, custom_config)
                 
+    @staticmethod
+    def _compile_patterns(patterns):
+        """Combine glob patterns into a single compiled regex (None if no patterns)."""
+        if not patterns:
+            return None
+        return re.compile("|".join(translate(pattern) for pattern in patterns))
+        
     def get(self, key, default=None):
         """Get a configuration value."""
         return self.config.get(key, default)
         
     def should_review_file(self, filename):
         """Determine if a file should be reviewed based on filters."""
-        from fnmatch import fnmatch
-        
-        # Check exclusions first
-        for pattern in self.config["file_filters"]["exclude"]:
-            if fnmatch(filename, pattern):
-                return False
-                
+        # Check exclusions first, cheapest checks before the regex
+        if filename in self._exclude_exact or filename.endswith(self._exclude_suffixes):
+            return False
+        if self._exclude_re and self._exclude_re.match(filename):
+            return False
+            
         # Then check inclusions
-        for pattern in self.config["file_filters"]["include"]:
-            if fnmatch(filename, pattern):
-                return True
-                
-        return False
+        if self._include_all:
+            return True
+        return bool(self._include_re and self._include_re.match(filename))
         
     def get_review_prompt_additions(self):
+        """Get the language-specific review instructions built for this config."""
+        return self._prompt_additions
+        
+    def _build_prompt_additions(self):
         """Generate language-specific review instructions."""
         focus_items = self.config["review_focus"]
         focus_text = ", ".join(focus_items)
         
         # Build language-specific instructions
-        language_instructions = ""
-        for lang, rules in self.config["language_specific_rules"].items():
-            style = rules.get("style_guide", "standard")
-            extra = ", ".join(rules.get("extra_focus", []))
-            language_instructions += f"\n- For {lang} files: Follow {style} guidelines" + (f" with focus on {extra}" if extra else "")
+        language_instructions = "".join([
+            f"\n- For {lang} files: Follow {rules.get('style_guide', 'standard')} guidelines"
+            + (f" with focus on {', '.join(rules['extra_focus'])}" if rules.get("extra_focus") else "")
+            for lang, rules in self.config["language_specific_rules"].items()
+        ])
         
         threshold_map = {
             "low": "Suggest improvements even for minor issues",
@@ -182,155 +358,390 @@ class PRReviewConfig:
         }
         mode_guidance = mode_map.get(self.config["review_mode"], mode_map["standard"])
         
-        return {
+        return types.MappingProxyType({
             "focus": focus_text,
             "language_specific": language_instructions,
             "threshold": threshold_guidance,
             "mode": mode_guidance
-        }
+        })
+
+# Comment categories in priority order: (group name, pattern, prefix)
+_COMMENT_CATEGORIES = [
+    ("security", r'security|vulnerability|attack|exploit|injection|xss|csrf|sanitiz', "🔒 **Security Issue:** "),
+    ("performance", r'performance|slow|efficient|complexity|o\(n\^2\)|optimize', "⚡ **Performance Issue:** "),
+    ("bug", r'bug|error|incorrect|wrong|fix|issue|problem|fail', "🐛 **Potential Bug:** "),
+    ("style", r'style|format|indent|spacing|naming|convention', "🎨 **Style Issue:** "),
+    ("maintainability", r'maintain|readability|clean|refactor|complex|understand', "🧹 **Maintainability:** "),
+]
+_CATEGORY_RE = re.compile("|".join(f"(?P<{name}>{pattern})" for name, pattern, _ in _COMMENT_CATEGORIES))
+_CATEGORY_PRIORITY = {name: priority for priority, (name, _, _) in enumerate(_COMMENT_CATEGORIES)}
+_CATEGORY_PREFIXES = {name: prefix for name, _, prefix in _COMMENT_CATEGORIES}
+
+# Patterns used to clean up review comments
+_LEADING_LABEL_RE = re.compile(r'^(Issue|Problem|Bug|Note|Warning):\s*')
+_INLINE_CODE_RE = re.compile(r'`([^`]+)`')
+# "instead of `x`" names the code being replaced, so it doesn't start the suggestion
+_SUGGESTION_SPLIT_RE = re.compile(r'\b(consider|instead(?! of\b)|use|replace)\b', re.IGNORECASE)
 
 def format_comment_text(comment_text, file_name, language):
     """Format a comment for better readability and impact."""
     # Strip any unnecessary prefixes LLMs sometimes add
-    comment_text = re.sub(r'^(Issue|Problem|Bug|Note|Warning):\s*', '', comment_text)
+    comment_text = _LEADING_LABEL_RE.sub('', comment_text)
+    lowered = comment_text.lower()
     
-    # Identify the type of comment to add appropriate emoji and formatting
-    if re.search(r'security|vulnerability|attack|exploit|injection|xss|csrf|sanitiz', comment_text.lower()):
-        prefix = "🔒 **Security Issue:** "
-    elif re.search(r'performance|slow|efficient|complexity|o\(n\^2\)|optimize', comment_text.lower()):
-        prefix = "⚡ **Performance Issue:** "
-    elif re.search(r'bug|error|incorrect|wrong|fix|issue|problem|fail', comment_text.lower()):
-        prefix = "🐛 **Potential Bug:** "
-    elif re.search(r'style|format|indent|spacing|naming|convention', comment_text.lower()):
-        prefix = "🎨 **Style Issue:** "
-    elif re.search(r'maintain|readability|clean|refactor|complex|understand', comment_text.lower()):
-        prefix = "🧹 **Maintainability:** "
-    else:
-        prefix = "💡 **Suggestion:** "
+    # Identify the type of comment to add appropriate emoji and formatting.
+    # One scan finds every category mentioned; the highest-priority one wins.
+    category = None
+    for match in _CATEGORY_RE.finditer(lowered):
+        if category is None or _CATEGORY_PRIORITY[match.lastgroup] < _CATEGORY_PRIORITY[category]:
+            category = match.lastgroup
+            if _CATEGORY_PRIORITY[category] == 0:
+                break
+    prefix = _CATEGORY_PREFIXES.get(category, "💡 **Suggestion:** ")
         
     # Add code examples when appropriate
-    if "instead" in comment_text.lower() or "consider" in comment_text.lower():
+    if "instead" in lowered or "consider" in lowered:
         # Try to extract or generate a code example
         if language == "python" and not "```python" in comment_text:
-            # Add code block if one doesn't exist and there seems to be code
-            code_match = re.search(r'`([^`]+)`', comment_text)
-            if code_match and len(code_match.group(1)) > 5:  # If there's inline code of reasonable length
-                # Split suggestion from example
-                suggestion, rest = re.split(r'\b(consider|instead|use|replace)\b', comment_text, 1, re.IGNORECASE)
-                if len(rest) > 5:  # If we have a meaningful suggestion part
+            # Split suggestion from example at the first keyword
+            keyword_match = _SUGGESTION_SPLIT_RE.search(comment_text)
+            if keyword_match:
+                suggestion = comment_text[:keyword_match.start()]
+                rest = comment_text[keyword_match.end():]
+                # "replace `old` with `new`": the recommended code follows "with"
+                if keyword_match.group(1).lower() == "replace":
+                    rest = rest.partition(" with ")[2]
+                # Only recommend code that comes after the keyword, never the code being criticised
+                code_match = _INLINE_CODE_RE.search(rest)
+                if code_match and len(code_match.group(1)) > 5:  # If there's inline code of reasonable length
+                    if not suggestion.strip():
+                        # The comment opens with the keyword, so keep all of it
+                        suggestion = comment_text
                     comment_text = f"{suggestion}\n\nRecommended approach:\n```{language}\n{code_match.group(1)}\n```"
     
     return prefix + comment_text
 
-def get_pull_request_diff(repo_name, pr_number, token):
-    """Fetch PR diff from GitHub API."""
+def get_json(url):
+    """
+    GET a GitHub API URL.
+
+    Returns (status_code, data, link_header); data is None on failure.
+    """
+    response = SESSION.get(url)
+    if response.status_code != 200:
+        logger.error(f"Response content: {response.text}")
+        return response.status_code, None, ""
+    return 200, _loads(response.content), response.headers.get('Link', '')
+
+def post_with_rate_limit(url, payload, max_attempts=3):
+    """POST JSON to GitHub, waiting out secondary rate limits signalled with Retry-After."""
+    for attempt in range(1, max_attempts + 1):
+        response = SESSION.post(url, data=_dumps(payload), headers=_JSON_HEADERS)
+        if response.status_code not in (403, 429) or attempt == max_attempts:
+            return response
+        try:
+            retry_after = float(response.headers["Retry-After"])
+        except (KeyError, ValueError):
+            return response
+        logger.warning(f"Rate limited by GitHub, retrying in {retry_after:.0f}s")
+        time.sleep(retry_after)
+    return response
+
+def iter_pull_request_files(repo_name, pr_number):
+    """
+    Fetch the PR's changed files from GitHub API, yielding them page by page.
+
+    The review can start on the first page while later pages are still being
+    fetched. Raises RuntimeError if the first page can't be fetched.
+    """
     logger.info(f"Fetching PR diff for repo: {repo_name}, PR number: {pr_number}")
-    url = f"https://api.github.com/repos/{repo_name}/pulls/{pr_number}/files"
-    headers = {"Authorization": f"token {token}", "Accept": "application/vnd.github.v3+json"}
+    url = f"https://api.github.com/repos/{repo_name}/pulls/{pr_number}/files?per_page=100"
     
-    try:
-        response = requests.get(url, headers=headers)
-        logger.info(f"GitHub API response status: {response.status_code}")
-        
-        if response.status_code != 200:
-            logger.error(f"Response content: {response.text}")
-            return None
-            
-        # Get response with pagination if needed
-        result = response.json()
-        next_url = get_next_url(response.headers.get('Link', ''))
+    status_code, files, link_header = get_json(url)
+    logger.info(f"GitHub API response status: {status_code}")
+    if status_code != 200:
+        raise RuntimeError(f"Failed to fetch PR files: {status_code}")
+    yield from files
         
-        # Handle GitHub's pagination
-        while next_url:
-            logger.info(f"Fetching next page of files from: {next_url}")
-            response = requests.get(next_url, headers=headers)
-            if response.status_code == 200:
-                result.extend(response.json())
-                next_url = get_next_url(response.headers.get('Link', ''))
-            else:
-                logger.error(f"Failed to fetch next page: {response.status_code}")
-                break
-                
-        return result
-    except Exception as e:
-        logger.error(f"Error fetching PR diff: {str(e)}")
-        return None
+    # Get the rest with pagination if needed
+    last_url = get_last_url(link_header)
+    
+    if last_url:
+        # The last page number is known, so fetch the remaining pages in parallel
+        page_urls = get_page_urls(last_url)
+        logger.info(f"Fetching {len(page_urls)} more pages of files in parallel")
+        with ThreadPoolExecutor(max_workers=GITHUB_CONCURRENCY) as executor:
+            for page_status, page_data, _ in executor.map(get_json, page_urls):
+                if page_status == 200:
+                    yield from page_data
+                else:
+                    logger.error(f"Failed to fetch page: {page_status}")
+        return
+    
+    next_url = get_next_url(link_header)
+    
+    # Handle GitHub's pagination
+    while next_url:
+        logger.info(f"Fetching next page of files from: {next_url}")
+        status_code, page_data, link_header = get_json(next_url)
+        if status_code == 200:
+            yield from page_data
+            next_url = get_next_url(link_header)
+        else:
+            logger.error(f"Failed to fetch next page: {status_code}")
+            break
 
 def get_next_url(link_header):
     """Extract next URL from GitHub's Link header for pagination."""
-    if not link_header:
-        return None
-        
-    links = {}
-    for link in link_header.split(','):
-        parts = link.split(';')
-        if len(parts) == 2:
-            url = parts[0].strip().lstrip('<').rstrip('>')
-            rel = parts[1].strip()
-            if 'rel="next"' in rel:
-                return url
-    return None
-
-def get_existing_comments(repo_name, pr_number, token):
-    """Get existing AI review comments to avoid duplication."""
+    match = _NEXT_LINK_RE.search(link_header) if link_header else None
+    return match.group(1) if match else None
+
+def get_last_url(link_header):
+    """Extract last page URL from GitHub's Link header for pagination."""
+    match = _LAST_LINK_RE.search(link_header) if link_header else None
+    return match.group(1) if match else None
+
+def get_page_urls(last_url):
+    """Build the URLs for pages 2..N given the URL of the last page."""
+    parsed = urlparse(last_url)
+    query = parse_qs(parsed.query)
+    last_page = int(query.get("page", ["1"])[0])
+    
+    urls = []
+    for page in range(2, last_page + 1):
+        query["page"] = [str(page)]
+        urls.append(urlunparse(parsed._replace(query=urlencode(query, doseq=True))))
+    return urls
+
+def _ai_comment_keys(comments):
+    """Get the (path, position) keys of our own AI comments, used to avoid duplication."""
+    return frozenset(
+        (comment["path"], comment["position"])
+        for comment in comments
+        if (body := comment.get("body")) and AI_PREFIX in body
+        and comment.get("path") and comment.get("position")
+    )
+
+def get_existing_comments(repo_name, pr_number):
+    """Get the (path, position) keys of existing AI review comments to avoid duplication."""
     url = f"https://api.github.com/repos/{repo_name}/pulls/{pr_number}/comments"
-    headers = {"Authorization": f"token {token}", "Accept": "application/vnd.github.v3+json"}
     
     try:
-        response = requests.get(url, headers=headers)
-        if response.status_code == 200:
-            comments = response.json()
-            # Filter for our AI comments
-            ai_comments = [
-                comment for comment in comments 
-                if "💡 AI Review:" in comment.get("body", "")
-            ]
-            return ai_comments
+        status_code, comments, _ = get_json(url)
+        if status_code == 200:
+            return _ai_comment_keys(comments)
         else:
-            logger.error(f"Failed to fetch existing comments: {response.status_code}")
-            return []
+            logger.error(f"Failed to fetch existing comments: {status_code}")
+            return frozenset()
     except Exception as e:
         logger.error(f"Error fetching existing comments: {str(e)}")
-        return []
+        return frozenset()
+
+def get_pull_request_head_sha(repo_name, pr_number):
+    """Fetch the PR details to get the latest commit ID."""
+    url = f"https://api.github.com/repos/{repo_name}/pulls/{pr_number}"
+    
+    try:
+        pr_info = _loads(SESSION.get(url).content)
+        return pr_info.get("head", {}).get("sha", "")
+    except Exception as e:
+        logger.error(f"Error fetching PR info: {str(e)}")
+        return ""
+
+def get_pull_request_metadata(repo_name, pr_number):
+    """
+    Get the head commit ID and existing AI review comment keys in one GraphQL request.
+
+    Further requests are only made if the PR has more than 100 review threads.
+    Falls back to the separate REST calls if the GraphQL request fails.
+    Returns (commit_id, existing_keys).
+    """
+    owner, name = repo_name.split("/", 1)
+    variables = {"owner": owner, "name": name, "number": int(pr_number), "after": None}
+    
+    try:
+        existing_keys = set()
+        while True:
+            payload = {"query": PR_METADATA_QUERY, "variables": variables}
+            response = SESSION.post("https://api.github.com/graphql", data=_dumps(payload), headers=_JSON_HEADERS)
+            data = _loads(response.content) if response.status_code == 200 else {}
+            pull_request = (data.get("data") or {}).get("repository", {}).get("pullRequest")
+            if not pull_request or data.get("errors"):
+                raise ValueError(data.get("errors") or f"status {response.status_code}")
+                
+            threads = pull_request["reviewThreads"]
+            existing_keys.update(_ai_comment_keys(
+                comment
+                for thread in threads["nodes"]
+                for comment in thread["comments"]["nodes"]
+            ))
+            if not threads["pageInfo"]["hasNextPage"]:
+                return pull_request["headRefOid"], frozenset(existing_keys)
+            variables["after"] = threads["pageInfo"]["endCursor"]
+    except Exception as e:
+        logger.warning(f"GraphQL PR metadata request failed, falling back to REST: {str(e)}")
+        
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        comments_future = executor.submit(get_existing_comments, repo_name, pr_number)
+        commit_future = executor.submit(get_pull_request_head_sha, repo_name, pr_number)
+        return commit_future.result(), comments_future.result()
+
+@dataclass
+class PullRequestData:
+    """Everything fetched about a PR for the review."""
+    files: Iterator  # PR files, fetched page by page as the review consumes them
+    metadata: Future  # (commit_id, existing_keys), only needed once posting starts
+
+def _prefetch_pr(repo_name, pr_number, executor):
+    """Start the lazy PR file fetch and the background head commit/AI comment fetch."""
+    metadata = executor.submit(get_pull_request_metadata, repo_name, pr_number)
+    return PullRequestData(files=iter_pull_request_files(repo_name, pr_number), metadata=metadata)
+
+# Programming language by (lowercase) file extension
+_EXTENSION_MAP = types.MappingProxyType({
+    '.py': 'python',
+    '.js': 'javascript',
+    '.jsx': 'javascript',
+    '.ts': 'typescript',
+    '.tsx': 'typescript',
+    '.java': 'java',
+    '.c': 'c',
+    '.cpp': 'c++',
+    '.cs': 'c#',
+    '.go': 'go',
+    '.rb': 'ruby',
+    '.php': 'php',
+    '.swift': 'swift',
+    '.kt': 'kotlin',
+    '.rs': 'rust',
+    '.scala': 'scala',
+    '.sh': 'shell',
+    '.bash': 'shell',
+    '.html': 'html',
+    '.css': 'css',
+    '.scss': 'scss',
+    '.sql': 'sql',
+})
 
+# Called once per reviewed file and again per file with comments when posting
+@functools.lru_cache(maxsize=512)
 def get_file_language(file_name):
     """Determine programming language from file extension."""
-    extension_map = {
-        '.py': 'python',
-        '.js': 'javascript',
-        '.jsx': 'javascript',
-        '.ts': 'typescript',
-        '.tsx': 'typescript',
-        '.java': 'java',
-        '.c': 'c',
-        '.cpp': 'c++',
-        '.cs': 'c#',
-        '.go': 'go',
-        '.rb': 'ruby',
-        '.php': 'php',
-        '.swift': 'swift',
-        '.kt': 'kotlin',
-        '.rs': 'rust',
-        '.scala': 'scala',
-        '.sh': 'shell',
-        '.bash': 'shell',
-        '.html': 'html',
-        '.css': 'css',
-        '.scss': 'scss',
-        '.sql': 'sql',
-    }
+    _, dot, ext = file_name.rpartition('.')
+    if not dot:
+        return 'unknown'
+    return _EXTENSION_MAP.get('.' + ext.lower(), 'unknown')
+
+async def _stream_review(client, prompt):
+    """
+    Stream a review completion and split it as chunks arrive.
+
+    Completed lines before the "Summary:" marker are scanned with _INLINE_RE
+    as they arrive. Lines that could still run into the next line's comment
+    (e.g. "Line 3:") are held back until a line that can't. Returns
+    (matches, summary), where matches is a list of (line_num, comment_text)
+    pairs with non-empty, stripped comment text and summary is None if the
+    response had no "Summary:" section.
+    """
+    stream = await client.chat.completions.create(
+        model="gpt-4",
+        messages=[{"role": "user", "content": prompt}],
+        temperature=0.1,  # Lower temperature for more consistent reviews
+        stream=True,
+    )
+    
+    matches = []
+    summary_parts = None
+    # Completed lines held back unscanned, and the chunks of the line still arriving
+    held = []
+    line_parts = []
+    # Last characters seen, so a marker split across chunks is still found
+    tail = ""
+    
+    def match_text(text):
+        for match in _INLINE_RE.finditer(text):
+            comment_text = match.group(2).strip()
+            if comment_text:
+                matches.append((match.group(1), comment_text))
     
-    ext = Path(file_name).suffix.lower()
-    return extension_map.get(ext, 'unknown')
+    async for chunk in stream:
+        if not chunk.choices:
+            continue
+        delta = chunk.choices[0].delta.content
+        if not delta:
+            continue
+        if summary_parts is not None:
+            summary_parts.append(delta)
+            continue
+            
+        # Only the new text (plus a marker's length of the old) needs searching
+        marker_at = (tail + delta).find("Summary:")
+        if marker_at >= 0:
+            text = "".join(held) + "".join(line_parts) + delta
+            marker_at += len(text) - len(delta) - len(tail)
+            match_text(text[:marker_at])
+            summary_parts = [text[marker_at + len("Summary:"):]]
+            continue
+        tail = (tail + delta)[-(len("Summary:") - 1):]
+        
+        if "\n" not in delta:
+            line_parts.append(delta)
+            continue
+        lines = ("".join(line_parts) + delta).split("\n")
+        line_parts = [lines.pop()]
+        # Scan up to the last completed line that can't continue into the next one
+        last_closed = len(lines) - 1
+        while last_closed >= 0 and _CONTINUED_LINE_RE.fullmatch(lines[last_closed]):
+            last_closed -= 1
+        if last_closed >= 0:
+            held.append("\n".join(lines[:last_closed + 1]))
+            match_text("".join(held))
+            held = []
+        held.extend(line + "\n" for line in lines[last_closed + 1:])
+    
+    if summary_parts is None:
+        match_text("".join(held) + "".join(line_parts))
+        return matches, None
+    return matches, "".join(summary_parts)
 
-def review_code_with_gpt(file_diffs, config, existing_comments):
+def _create_openai_client():
+    """Create the async OpenAI client."""
+    # Imported here so runs with nothing to review don't pay the import cost
+    import openai
+    import httpx
+    
+    try:
+        # With h2 installed the concurrent review streams share one multiplexed connection
+        import h2  # noqa: F401
+        http2 = True
+    except ImportError:
+        http2 = False
+    
+    # Use only the modern OpenAI client approach (v1.0.0+) with explicitly disabled proxies
+    return openai.AsyncOpenAI(
+        api_key=os.getenv("OPENAI_API_KEY"),
+        http_client=httpx.AsyncClient(proxies=None, http2=http2, timeout=60)
+    )
+
+async def _iter_in_thread(iterable):
+    """Iterate a blocking iterator (e.g. paginated API results) without blocking the event loop."""
+    iterator = iter(iterable)
+    done = object()
+    while True:
+        item = await asyncio.to_thread(next, iterator, done)
+        if item is done:
+            return
+        yield item
+
+async def review_code_with_gpt(file_diffs, config, concurrency=REVIEW_CONCURRENCY):
     """
     Request GPT for intelligent code review with customized focus areas
     based on configuration.
-    """
-    openai.api_key = os.getenv("OPENAI_API_KEY")
-    logger.info("Sending code diff to OpenAI for review...")
 
+    file_diffs may be a lazy iterator; each file's review starts as soon as
+    it arrives. Files are reviewed concurrently (at most `concurrency`
+    OpenAI calls in flight) and results are collected in the original order.
+    """
     reviews = []
     all_summaries = []
     
@@ -338,82 +749,27 @@ def review_code_with_gpt(file_diffs, config, existing_comments):
     prompt_additions = config.get_review_prompt_additions()
     summary_length = config.get("summary_length", 200)
     
-    # Prepare existing comment map to avoid duplication
-    existing_comment_map = {}
-    for comment in existing_comments:
-        path = comment.get("path", "")
-        position = comment.get("position")
-        if path and position:
-            key = f"{path}:{position}"
-            existing_comment_map[key] = comment.get("body", "")
-
-    for file in file_diffs:
-        file_name = file.get("filename")
-        patch = file.get("patch", "")
-        
-        # Skip if no patch or if file shouldn't be reviewed based on filters
-        if not patch or not config.should_review_file(file_name):
-            logger.info(f"Skipping review for {file_name} (filtered out or no changes)")
-            continue
-            
+    client = None
+    semaphore = asyncio.Semaphore(concurrency)
+    instructions = PROMPT_INSTRUCTIONS_TEMPLATE.format(**prompt_additions, summary_length=summary_length)
+
+    async def _review_one(file_name, patch):
+        """Review a single file and return (review or None, summaries)."""
+        summaries = []
         language = get_file_language(file_name)
         
         # Enhanced prompt with configuration
-        prompt = f"""You are an expert AI code reviewer. Review the code diff for `{file_name}` (language: {language}):
-
-{patch}
-
-INSTRUCTIONS:
-1. **Review Focus**: Focus on {prompt_additions['focus']}
-2. **Comment Threshold**: {prompt_additions['threshold']}
-3. **Review Mode**: {prompt_additions['mode']}
-4. **Language-Specific Guidance**: {prompt_additions['language_specific']}
-
-5. **Inline Comments**:
-   - Only comment on lines that NEED improvement or contain issues
-   - CRITICAL: Format comments EXACTLY as: "Line X: Your detailed comment" where X is the line number
-   - For each comment:
-     * Be specific about what the issue is
-     * Explain WHY it matters (security risk, performance impact, etc.)
-     * Provide a concrete suggestion for improvement
-     * If possible, include a code example of the fix
-   - Prioritize significant issues (security, bugs, performance) over minor style issues
-
-6. **PR Summary**:
-   - Provide a concise summary (<= {summary_length} words)
-   - Highlight the most important changes and their impact
-   - Mention any architectural implications
-   - Note positive aspects, not just criticisms
-   - Prioritize suggestions by importance
-
-Output format:
-[Inline Comments]
-
-Summary:
-[Your summary here]
-"""
+        prompt = f"You are an expert AI code reviewer. Review the code diff for `{file_name}` (language: {language}):\n\n{patch}\n\n{instructions}"
 
         try:
-            # Use only the modern OpenAI client approach (v1.0.0+) with explicitly disabled proxies
-            client = openai.OpenAI(
-                api_key=openai.api_key,
-                http_client=httpx.Client(proxies=None)
-            )
-            response = client.chat.completions.create(
-                model="gpt-4",
-                messages=[{"role": "user", "content": prompt}],
-                temperature=0.1,  # Lower temperature for more consistent reviews
-            )
-            review_text = response.choices[0].message.content.strip()
+            async with semaphore:
+                matches, summary = await _stream_review(client, prompt)
             
             # Parse response
             try:
-                if "Summary:" in review_text:
-                    inline_comments, summary = review_text.split("Summary:", 1)
-                else:
-                    # If there's no "Summary:" marker, treat the whole text as comments and provide a generic summary
+                if summary is None:
+                    # If there's no "Summary:" marker, the whole text was treated as comments; provide a generic summary
                     logger.warning(f"No 'Summary:' section found in response for {file_name}")
-                    inline_comments = review_text
                     summary = "No summary provided by the AI review."
 
                 summary = summary.strip()
@@ -425,73 +781,138 @@ Summary:
                     )
             except Exception as e:
                 logger.error(f"Error parsing AI response for {file_name}: {str(e)}")
-                logger.error(f"Response preview: {review_text[:100]}...")
                 # Generate error summary
-                inline_comments = ""
+                matches = []
                 summary = f"**Error parsing AI response**: {str(e)}"
 
             # Format and collect the summary
             formatted_summary = f"### {file_name}\n{summary}"
-            all_summaries.append(formatted_summary)
+            summaries.append(formatted_summary)
 
             # Process inline comments - improve parsing with more robust line number extraction
             inline_dict = {}
             try:
-                # This pattern should capture exactly two groups: line number and comment text
-                comment_pattern = re.compile(r'^(?:(?:Line(?:\s+number)?|L)?[\s:]*)(\d+)[\s:]+(.+)$', re.IGNORECASE | re.MULTILINE)
-                
-                # Find all comments with line numbers using regex
-                matches = comment_pattern.findall(inline_comments)
                 logger.info(f"Found {len(matches)} potential comments in {file_name}")
                 
-                for match in matches:
+                for line_num, comment_text in matches:
                     try:
-                        # findall returns tuples of the captured groups, should be (line_num, comment_text)
-                        if len(match) == 2:
-                            line_num, comment_text = match
-                        else:
-                            # Log unusual match format and continue
-                            logger.warning(f"Unexpected match format in {file_name}: {match}")
-                            continue
-                            
-                        comment_text = comment_text.strip()
-                        if not comment_text:
-                            continue
-                        
                         # Format the comment text for better readability
                         formatted_comment = format_comment_text(comment_text, file_name, language)
                         
-                        # Merge if there's already a comment for this line
-                        if line_num in inline_dict:
-                            inline_dict[line_num] += f"\n\n**Additional issue:** {formatted_comment}"
-                        else:
-                            inline_dict[line_num] = formatted_comment
+                        # Collect every comment for this line; they are merged below
+                        inline_dict.setdefault(line_num, []).append(formatted_comment)
                     except Exception as e:
                         # Log the error and continue with other comments
-                        logger.error(f"Error processing comment match '{match}': {str(e)}")
+                        logger.error(f"Error processing comment for line {line_num}: {str(e)}")
                         continue
             except Exception as e:
                 logger.error(f"Error parsing comments in {file_name}: {str(e)}")
                 # Add fallback summary for error cases
-                all_summaries.append(f"### {file_name}\n❌ Error during review: {str(e)}")
+                summaries.append(f"### {file_name}\n❌ Error during review: {str(e)}")
 
             if inline_dict:
+                # Merge multiple comments on the same line in one join instead of repeated +=
+                inline_dict = {
+                    line_num: "\n\n**Additional issue:** ".join(comments)
+                    for line_num, comments in inline_dict.items()
+                }
                 # We pass the entire patch to figure out positions, but only lines that are truly improved
-                reviews.append((file_name, patch, inline_dict, existing_comment_map))
+                return (file_name, patch, inline_dict), summaries
 
         except Exception as e:
             logger.error(f"Error reviewing {file_name}: {str(e)}")
-            all_summaries.append(f"### {file_name}\n❌ Error during review: {str(e)}")
+            summaries.append(f"### {file_name}\n❌ Error during review: {str(e)}")
+
+        return None, summaries
+
+    reviewed_files = []
+    tasks = []
+    try:
+        async for file in _iter_in_thread(file_diffs):
+            file_name = file.get("filename")
+            patch = file.get("patch", "")
+            
+            # Skip if no patch or if file shouldn't be reviewed based on filters
+            if not patch or not config.should_review_file(file_name):
+                logger.info(f"Skipping review for {file_name} (filtered out or no changes)")
+                continue
+                
+            if client is None:
+                logger.info("Sending code diff to OpenAI for review...")
+                client = _create_openai_client()
+            reviewed_files.append(file_name)
+            tasks.append(asyncio.create_task(_review_one(file_name, patch)))
+            
+        results = await asyncio.gather(*tasks, return_exceptions=True)
+    except BaseException:
+        for task in tasks:
+            task.cancel()
+        raise
+    finally:
+        if client is not None:
+            await client.close()
+            
+    if not tasks:
+        logger.info("No reviewable changes detected")
+        return [], "No reviewable changes detected."
+
+    # Collect results in the original file order
+    for file_name, result in zip(reviewed_files, results):
+        if isinstance(result, Exception):
+            logger.error(f"Error reviewing {file_name}: {str(result)}")
+            all_summaries.append(f"### {file_name}\n❌ Error during review: {str(result)}")
+            continue
+        review, summaries = result
+        if review:
+            reviews.append(review)
+        all_summaries.extend(summaries)
 
     # Combine all summaries with better organization
     combined_summary = "\n\n".join(all_summaries)
     return reviews, combined_summary
 
-def post_inline_comments(repo_name, pr_number, token, reviews, config):
-    """Post inline comments to GitHub PR with improved formatting and deduplication."""
+def _index_patch(patch, max_line=None):
+    """
+    Walk a patch once and map each added line number to its diff position and code.
+
+    Returns {line_num: (position, code_content)}, where line_num counts `+`
+    lines from 1 in the order they appear in the patch. The walk stops after
+    added line `max_line` if given.
+    """
+    line_index = {}
+    position = 1
+    plus_line_counter = 0
+    
+    # Split on '\n' only: splitlines() would also break on '\r', '\x0c' etc. inside code and shift positions
+    for diff_line in patch.split('\n'):
+        first = diff_line[:1]
+        # Count lines that start with '+', but not the '+++ ' file header
+        if first == '+' and not diff_line.startswith('+++ '):
+            plus_line_counter += 1
+            # Store the actual code content (without the leading '+') alongside its position
+            line_index[plus_line_counter] = (position, diff_line[1:].strip())
+            if plus_line_counter == max_line:
+                break
+            position += 1
+        elif first == '@' and diff_line.startswith('@@ '):
+            # Diff hunk header: reset position to 1 for each new hunk
+            position = 1
+        else:
+            # For non-additive lines in the diff
+            position += 1
+            
+    return line_index
+
+def post_inline_comments(repo_name, pr_number, reviews, config, commit_id, existing_keys):
+    """
+    Post inline comments to GitHub PR with improved formatting and deduplication.
+
+    All comments are submitted as a single review; if GitHub rejects the batch,
+    they are posted individually in parallel instead.
+    """
     logger.info(f"Posting inline comments to PR #{pr_number} in repo {repo_name}")
     url = f"https://api.github.com/repos/{repo_name}/pulls/{pr_number}/comments"
-    headers = {"Authorization": f"token {token}", "Accept": "application/vnd.github.v3+json"}
+    review_url = f"https://api.github.com/repos/{repo_name}/pulls/{pr_number}/reviews"
 
     # Get styling preferences
     styling = config.get("comment_styling", {})
@@ -499,113 +920,80 @@ def post_inline_comments(repo_name, pr_number, token, reviews, config):
     show_code_block = styling.get("show_code_block", True)
     show_details = styling.get("show_details", True)
     custom_signature = styling.get("custom_signature", "")
+    show_code_preview = show_code_block and styling.get("show_code_preview", False)
+
+    # Build the static parts of the comment body once
+    # Simplified title - no line numbers since GitHub already shows this context
+    header = "### AI Code Review\n\n" if styling.get("emoji_prefix", True) else "### Code Review\n\n"
+    footer_parts = []
+    # Make details section optional and off by default
+    if show_details and styling.get("show_details", False):
+        footer_parts.append(f"\n\n<details>\n"
+            f"<summary>About this review</summary>\n\n"
+            f"This automated review identifies potential issues in your code to help improve quality.\n"
+            f"Each suggestion aims to make your code more secure, performant, or maintainable.\n"
+            f"</details>")
+    if custom_signature:
+        footer_parts.append(f"\n\n{custom_signature}")
+    footer = "".join(footer_parts)
 
-    # Fetch the PR details to get the latest commit ID
-    pr_info_url = f"https://api.github.com/repos/{repo_name}/pulls/{pr_number}"
-    
     try:
-        pr_info = requests.get(pr_info_url, headers=headers).json()
-        commit_id = pr_info.get("head", {}).get("sha", "")
         if not commit_id:
             logger.error("❌ Failed to get commit SHA")
-            return
+            return 0
             
-        comment_count = 0
+        comments = []
         # For each file reviewed
-        for file_name, patch, inline_dict, existing_comments in reviews:
-            lines = patch.split('\n')
-            # Track the current line number in the diff for every `+` line
-            position = 1
-            plus_line_counter = 0
-            # Store the actual line content for better context in comments
-            line_content_map = {}
-
-            # First pass: collect line contents
-            for diff_line in lines:
-                if diff_line.startswith('+') and not diff_line.startswith('+++ '):
-                    plus_line_counter += 1
-                    # Store the actual code content (without the leading '+')
-                    line_content_map[str(plus_line_counter)] = diff_line[1:].strip()
-
-            # Reset counters for second pass
-            position = 1
-            plus_line_counter = 0
-
-            for diff_line in lines:
-                # We only increment position for lines that start with '+'
-                # but skip lines that start with '++' in the hunk header
-                if diff_line.startswith('+') and not diff_line.startswith('+++ '):
-                    plus_line_counter += 1
-
-                    # If we have a comment for this `plus_line_counter` line, post it
-                    line_str = str(plus_line_counter)
-                    if line_str in inline_dict:
-                        comment_text = inline_dict[line_str]
-                        
-                        # Check if already commented on this line
-                        comment_key = f"{file_name}:{position}"
-                        if comment_key in existing_comments:
-                            logger.info(f"Skipping duplicate comment at {file_name}:{line_str}")
-                            position += 1
-                            continue
-                        
-                        # Get the actual code content for this line
-                        code_content = line_content_map.get(line_str, "")
-                        language = get_file_language(file_name)
-                        
-                        # Build comment body according to styling preferences - much more minimal
-                        body_parts = []
-                        
-                        # Simplified title - no line numbers since GitHub already shows this context
-                        if styling.get("emoji_prefix", True):
-                            body_parts.append(f"### AI Code Review\n\n")
-                        else:
-                            body_parts.append(f"### Code Review\n\n")
-                        
-                        # Remove redundant line reference since GitHub UI already shows this
-                        
-                        # Only show code snippet if explicitly enabled and non-empty
-                        if show_code_block and code_content and styling.get("show_code_preview", False):
-                            body_parts.append(f"```{language}\n{code_content}\n```\n\n")
-                        
-                        # The actual review comment is the most important part
-                        body_parts.append(f"{comment_text}")
-                        
-                        # Make details section optional and off by default
-                        if show_details and styling.get("show_details", False):
-                            body_parts.append(f"\n\n<details>\n"
-                                f"<summary>About this review</summary>\n\n"
-                                f"This automated review identifies potential issues in your code to help improve quality.\n"
-                                f"Each suggestion aims to make your code more secure, performant, or maintainable.\n"
-                                f"</details>")
-                        
-                        if custom_signature:
-                            body_parts.append(f"\n\n{custom_signature}")
-                        
-                        body = "".join(body_parts)
-                        
-                        comment_data = {
-                            "body": body,
-                            "commit_id": commit_id,
-                            "path": file_name,
-                            "position": position
-                        }
-                        
-                        response = requests.post(url, headers=headers, json=comment_data)
-                        if response.status_code in [201, 200]:
-                            comment_count += 1
-                            logger.info(f"✅ Posted comment for {file_name}, line {line_str}")
-                        else:
-                            logger.error(f"❌ Failed to post comment: {response.status_code} - {response.text}")
-
-                    position += 1
-                elif diff_line.startswith('@@ '):
-                    # Diff hunk header: reset position to 1 for each new hunk
-                    position = 1
-                else:
-                    # For non-additive lines in the diff
-                    position += 1
+        for file_name, patch, inline_dict in reviews:
+            if not inline_dict:
+                continue
+                
+            language = get_file_language(file_name)
+            # Only walk the patch as far as the last line that has a comment
+            line_index = _index_patch(patch, max(map(int, inline_dict)))
+            
+            for line_str, comment_text in inline_dict.items():
+                position, code_content = line_index.get(int(line_str), (None, ""))
+                if position is None:
+                    logger.warning(f"Skipping comment for {file_name}:{line_str} (line not in diff)")
+                    continue
                     
+                # Check if already commented on this line
+                if (file_name, position) in existing_keys:
+                    logger.info(f"Skipping duplicate comment at {file_name}:{line_str}")
+                    continue
+                
+                # Only show code snippet if explicitly enabled and non-empty
+                code_block = f"```{language}\n{code_content}\n```\n\n" if show_code_preview and code_content else ""
+                
+                # The actual review comment is the most important part
+                body = f"{header}{code_block}{AI_PREFIX}{comment_text}{footer}"
+                
+                comments.append({
+                    "body": body,
+                    "path": file_name,
+                    "position": position
+                })
+                    
+        if not comments:
+            logger.info("No new inline comments to post")
+            return 0
+            
+        review_data = {
+            "event": "COMMENT",
+            "commit_id": commit_id,
+            "body": f"### AI Code Review\n\n{len(comments)} inline comments",
+            "comments": comments
+        }
+        response = post_with_rate_limit(review_url, review_data)
+        if response.status_code in [201, 200]:
+            comment_count = len(comments)
+            logger.info(f"✅ Posted review with {comment_count} comments")
+        else:
+            logger.warning(f"Failed to post review: {response.status_code} - {response.text}")
+            logger.info("Falling back to posting comments individually")
+            comment_count = post_comments_individually(url, comments, commit_id)
+            
         logger.info(f"Posted {comment_count} inline comments total")
         return comment_count
         
@@ -613,11 +1001,24 @@ def post_inline_comments(repo_name, pr_number, token, reviews, config):
         logger.error(f"Error posting inline comments: {str(e)}")
         return 0
 
-def post_general_summary(repo_name, pr_number, token, summary_text, comment_count=0):
+def post_comments_individually(url, comments, commit_id):
+    """Post review comments one by one in parallel, returning the number posted."""
+    def post_comment(comment):
+        comment_data = dict(comment, commit_id=commit_id)
+        response = post_with_rate_limit(url, comment_data)
+        if response.status_code in [201, 200]:
+            logger.info(f"✅ Posted comment for {comment['path']}, position {comment['position']}")
+            return True
+        logger.error(f"❌ Failed to post comment: {response.status_code} - {response.text}")
+        return False
+        
+    with ThreadPoolExecutor(max_workers=COMMENT_CONCURRENCY) as executor:
+        return sum(executor.map(post_comment, comments))
+
+def post_general_summary(repo_name, pr_number, summary_text, comment_count=0):
     """Post a general summary comment with improved formatting."""
     logger.info(f"Posting general summary to PR #{pr_number}")
     url = f"https://api.github.com/repos/{repo_name}/issues/{pr_number}/comments"
-    headers = {"Authorization": f"token {token}", "Accept": "application/vnd.github.v3+json"}
 
     # Add some metadata to help with debugging
     timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S UTC")
@@ -651,7 +1052,7 @@ To customize this review, add a `.github/pr_review_config.yml` file to your repo
 """
 
     try:
-        response = requests.post(url, headers=headers, json={"body": body})
+        response = post_with_rate_limit(url, {"body": body})
         if response.status_code in [201, 200]:
             logger.info(f"✅ Successfully posted summary comment")
         else:
@@ -664,40 +1065,53 @@ def main():
     try:
         # Get GitHub event data
         event_path = os.getenv("GITHUB_EVENT_PATH")
-        with open(event_path, 'r') as f:
-            event_data = json.load(f)
+        with open(event_path, 'rb') as f:
+            event_data = _loads(f.read())
             
         # Extract PR details
         pr_number = event_data["pull_request"]["number"]
         repo_name = os.getenv("GITHUB_REPOSITORY")
         token = os.getenv("GITHUB_TOKEN") 
-        openai.api_key = os.getenv("OPENAI_API_KEY")
+        openai_api_key = os.getenv("OPENAI_API_KEY")
         
-        if not openai.api_key:
+        if not openai_api_key:
             logger.error("OpenAI API key is missing. Please set the OPENAI_API_KEY environment variable.")
             sys.exit(1)
             
         if not token:
             logger.error("GitHub token is missing. Please ensure GITHUB_TOKEN is available.")
             sys.exit(1)
+            
+        review_concurrency = os.getenv("REVIEW_CONCURRENCY") or str(REVIEW_CONCURRENCY)
+        try:
+            concurrency = int(review_concurrency)
+        except ValueError:
+            concurrency = 0
+        if concurrency < 1:
+            logger.error(f"Invalid REVIEW_CONCURRENCY '{review_concurrency}': it must be a whole number of at least 1.")
+            sys.exit(1)
         
         logger.info(f"Reviewing PR #{pr_number} in {repo_name}")
         
+        # Authenticate every GitHub API call made through the shared session
+        SESSION.headers.update({"Authorization": f"token {token}", "Accept": "application/vnd.github.v3+json"})
+        
         # Load configuration
         config = PRReviewConfig()
         
-        # Get the PR diff and existing comments
-        pr_diff = get_pull_request_diff(repo_name, pr_number, token)
-        existing_comments = get_existing_comments(repo_name, pr_number, token)
-        
-        # Review the code
-        reviews, summary = review_code_with_gpt(pr_diff, config, existing_comments)
+        # Get the PR files, existing comments and head commit
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            pr_data = _prefetch_pr(repo_name, pr_number, executor)
+            
+            # Review the code as the PR files are fetched
+            reviews, summary = asyncio.run(review_code_with_gpt(pr_data.files, config, concurrency))
+            commit_id, existing_keys = pr_data.metadata.result()
         
         # Post inline comments
-        comment_count = post_inline_comments(repo_name, pr_number, token, reviews, config)
+        comment_count = post_inline_comments(repo_name, pr_number, reviews, config, commit_id, existing_keys)
         
         # Post general summary
-        post_general_summary(repo_name, pr_number, token, summary, comment_count)
+        post_general_summary(repo_name, pr_number, summary, comment_count)
         
         logger.info(f"AI review completed successfully with {comment_count} comments")
     except Exception as e: